@@ -1,9 +1,24 @@
 import sqlite3
 import json
 import os
+import atexit
+import threading
+from collections.abc import Iterator
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 
+# orjson is an optional, faster drop-in for encoding/decoding 'source_urls'.
+# Its JSONDecodeError subclasses json.JSONDecodeError, so error handling is shared.
+try:
+    import orjson
+    _json_loads = orjson.loads
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+except ImportError:
+    _json_loads = json.loads
+    _json_dumps = json.dumps
+
 # This file will manage database operations.
 # It will include functions for connecting to the database,
 # creating tables, inserting stamp data, and querying information.
@@ -14,48 +29,135 @@ DATABASE_DIR = APP_BASE_DIR / "data" / "database"
 DATABASE_NAME = "stamps_collection.db"
 DATABASE_PATH = DATABASE_DIR / DATABASE_NAME
 
+# journal_mode=WAL is persistent in the database file, so it only needs to be
+# set once per database file per process rather than on every connection.
+_wal_enabled_paths = set()
+
+def _apply_connection_pragmas(conn: sqlite3.Connection):
+    """
+    Applies the performance PRAGMAs to a freshly opened connection.
+
+    WAL lets readers (e.g. the GUI looking up a clicked stamp) proceed while a
+    record is being written, and synchronous=NORMAL is safe under WAL while
+    avoiding an fsync on every commit. The remaining PRAGMAs are per-connection.
+    """
+    if DATABASE_PATH not in _wal_enabled_paths:
+        conn.execute("PRAGMA journal_mode=WAL")
+        _wal_enabled_paths.add(DATABASE_PATH)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-64000") # Negative value is in KiB (~64MB)
+    conn.execute("PRAGMA mmap_size=268435456") # 256MB
+
+# One connection per thread, reused across calls for the lifetime of the process.
+# Keeping it open avoids re-opening the db/-wal/-shm files on every query and
+# keeps SQLite's per-connection page cache warm.
+_tls = threading.local()
+_open_connections = []
+_open_connections_lock = threading.Lock()
+
+def _close_all_connections():
+    """Closes every cached connection. Registered with atexit."""
+    with _open_connections_lock:
+        for conn in _open_connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _open_connections.clear()
+
+atexit.register(_close_all_connections)
+
 def _get_db_connection():
-    """Establishes and returns a database connection."""
+    """
+    Returns this thread's cached database connection, creating it on first use.
+
+    A new connection is opened if DATABASE_PATH has changed since the cached
+    one was created (e.g. when pointed at a different database file).
+    """
+    conn = getattr(_tls, "conn", None)
+    if conn is not None and getattr(_tls, "path", None) == DATABASE_PATH:
+        return conn
+
     try:
         DATABASE_DIR.mkdir(parents=True, exist_ok=True)
-        conn = sqlite3.connect(DATABASE_PATH)
-        conn.row_factory = sqlite3.Row # Access columns by name
-        return conn
+        # check_same_thread=False only so the atexit hook may close connections
+        # created by other threads; each connection is still used by one thread.
+        conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+        # No row_factory: the getters select fixed column lists and build dicts
+        # from plain tuples, which is cheaper than sqlite3.Row + dict(row).
+        # PRAGMAs run before any statement opens an implicit transaction
+        _apply_connection_pragmas(conn)
     except sqlite3.Error as e:
         print(f"Database connection error: {e}")
         raise # Re-raise the exception to be handled by the caller
 
+    _tls.conn = conn
+    _tls.path = DATABASE_PATH
+    with _open_connections_lock:
+        _open_connections.append(conn)
+    return conn
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Returns the calling thread's shared database connection (opened lazily,
+    with WAL and the other PRAGMAs applied) so callers can open it up front,
+    e.g. at application startup, instead of on the first query.
+    """
+    return _get_db_connection()
+
+# Bumped whenever _SCHEMA_SCRIPT changes; stored in the file via PRAGMA user_version.
+SCHEMA_VERSION = 1
+
+# Every statement is idempotent so databases created before user_version was
+# tracked (user_version 0, table already present) upgrade cleanly.
+_SCHEMA_SCRIPT = f"""
+BEGIN;
+CREATE TABLE IF NOT EXISTS stamps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    original_image_ref TEXT,
+    detected_stamp_image_path TEXT UNIQUE NOT NULL,
+    search_keywords TEXT,
+    country TEXT,
+    title_suggestion TEXT,
+    estimated_price_range TEXT,
+    history_notes TEXT,
+    source_urls TEXT,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+PRAGMA user_version = {SCHEMA_VERSION};
+COMMIT;
+"""
+
 def initialize_database():
     """
     Ensures the database directory exists, connects to the SQLite database
     (creating it if it doesn't exist), and creates the 'stamps' table
     if it doesn't already exist.
+
+    The schema script only runs when the file's PRAGMA user_version is older
+    than SCHEMA_VERSION, so regular startups just read one header field.
     """
     try:
         conn = _get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS stamps (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            original_image_ref TEXT,
-            detected_stamp_image_path TEXT UNIQUE NOT NULL,
-            search_keywords TEXT,
-            country TEXT,
-            title_suggestion TEXT,
-            estimated_price_range TEXT,
-            history_notes TEXT,
-            source_urls TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        conn.commit()
+        current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if current_version < SCHEMA_VERSION:
+            conn.executescript(_SCHEMA_SCRIPT)
         print(f"Database initialized successfully at {DATABASE_PATH}")
     except sqlite3.Error as e:
         print(f"Error initializing database: {e}")
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
+
+# Insertable columns of the 'stamps' table, in a fixed order so every row
+# can be bound to the same INSERT statement.
+_STAMP_FIELDS = (
+    "original_image_ref", "detected_stamp_image_path", "search_keywords",
+    "country", "title_suggestion", "estimated_price_range",
+    "history_notes", "source_urls"
+)
+_INSERT_SQL = (
+    f"INSERT INTO stamps ({', '.join(_STAMP_FIELDS)}) "
+    f"VALUES ({', '.join(['?'] * len(_STAMP_FIELDS))})"
+)
 
 def add_stamp_record(stamp_data: dict) -> int | None:
     """
@@ -76,41 +178,121 @@ def add_stamp_record(stamp_data: dict) -> int | None:
 
     # Convert list of URLs to JSON string if present
     if "source_urls" in stamp_data and isinstance(stamp_data["source_urls"], list):
-        stamp_data["source_urls"] = json.dumps(stamp_data["source_urls"])
-
-    # Default values for optional fields if not provided
-    fields = [
-        "original_image_ref", "detected_stamp_image_path", "search_keywords",
-        "country", "title_suggestion", "estimated_price_range",
-        "history_notes", "source_urls"
-    ]
-    
-    # Constructing the query dynamically to handle missing optional fields
-    # All fields present in `stamp_data` will be used.
-    query_fields = [field for field in fields if field in stamp_data]
-    query_placeholders = ", ".join(["?"] * len(query_fields))
-    query_columns = ", ".join(query_fields)
-    
-    sql = f"INSERT INTO stamps ({query_columns}) VALUES ({query_placeholders})"
-    values = tuple(stamp_data[field] for field in query_fields)
+        stamp_data["source_urls"] = _json_dumps(stamp_data["source_urls"])
+
+    # Missing optional fields are bound as NULL so every call reuses the same
+    # statement and hits sqlite3's prepared-statement cache.
+    values = tuple(stamp_data.get(field) for field in _STAMP_FIELDS)
 
     try:
         conn = _get_db_connection()
         cursor = conn.cursor()
-        cursor.execute(sql, values)
+        cursor.execute(_INSERT_SQL, values)
         conn.commit()
         last_id = cursor.lastrowid
         print(f"Record added successfully with ID: {last_id}")
         return last_id
     except sqlite3.IntegrityError as e:
         print(f"Error adding record: {e}. 'detected_stamp_image_path' must be unique.")
+        # The connection is reused, so don't leave the failed transaction open
+        if 'conn' in locals() and conn:
+            conn.rollback()
         return None
     except sqlite3.Error as e:
         print(f"Database error adding record: {e}")
-        return None
-    finally:
         if 'conn' in locals() and conn:
-            conn.close()
+            conn.rollback()
+        return None
+
+def add_stamp_records(stamps_data: list[dict]) -> list[int]:
+    """
+    Adds several stamp records to the 'stamps' table in a single transaction.
+
+    Every row is bound to the same INSERT statement via executemany, so a sheet
+    with N stamps costs one commit instead of N. Missing optional fields are
+    stored as NULL. The batch is all-or-nothing: if any row fails (e.g. a
+    duplicate 'detected_stamp_image_path'), nothing is inserted.
+
+    Args:
+        stamps_data: A list of dictionaries in the same format accepted by
+                     add_stamp_record(). The dictionaries are not modified.
+
+    Returns:
+        The ids of the newly inserted rows, in input order, or an empty list
+        if the input is empty or insertion fails.
+    """
+    if not stamps_data:
+        return []
+
+    source_urls_idx = _STAMP_FIELDS.index("source_urls")
+    rows = []
+    for stamp_data in stamps_data:
+        if "detected_stamp_image_path" not in stamp_data:
+            print("Error: 'detected_stamp_image_path' is required for every record.")
+            return []
+        row = [stamp_data.get(field) for field in _STAMP_FIELDS]
+        if isinstance(row[source_urls_idx], list):
+            row[source_urls_idx] = _json_dumps(row[source_urls_idx])
+        rows.append(row)
+
+    try:
+        conn = _get_db_connection()
+        with conn: # Commits on success, rolls back the whole batch on error
+            cursor = conn.cursor()
+            cursor.executemany(_INSERT_SQL, rows)
+            # cursor.lastrowid is not set by executemany; AUTOINCREMENT ids
+            # within one transaction are consecutive, so derive them from the last.
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        inserted_ids = list(range(last_id - len(rows) + 1, last_id + 1))
+        print(f"{len(inserted_ids)} records added successfully.")
+        return inserted_ids
+    except sqlite3.IntegrityError as e:
+        print(f"Error adding records: {e}. 'detected_stamp_image_path' must be unique.")
+        return []
+    except sqlite3.Error as e:
+        print(f"Database error adding records: {e}")
+        return []
+
+@lru_cache(maxsize=1024)
+def _parse_source_urls_cached(raw_source_urls: str):
+    """
+    Parses a 'source_urls' JSON string, memoized by the raw string so that
+    repeated reads of the same value only decode it once.
+
+    Lists are cached as tuples so callers can't mutate the shared cache entry.
+    Raises json.JSONDecodeError for invalid JSON (errors are not cached).
+    """
+    parsed = _json_loads(raw_source_urls)
+    return tuple(parsed) if isinstance(parsed, list) else parsed
+
+def _parse_source_urls(raw_source_urls: str | None) -> list[str]:
+    """
+    Returns the stored 'source_urls' value as a fresh list of URL strings.
+
+    NULL/empty values become [], a JSON array becomes a list of its items and
+    any other JSON scalar (e.g. a bare string) is split into lines, so callers
+    never need to type-check the result.
+    Raises json.JSONDecodeError for invalid JSON.
+    """
+    if not raw_source_urls:
+        return []
+    parsed = _parse_source_urls_cached(raw_source_urls)
+    if isinstance(parsed, tuple):
+        return [str(url) for url in parsed if url]
+    if parsed is None:
+        return []
+    return [line for line in str(parsed).splitlines() if line.strip()]
+
+# Columns returned by get_stamp_by_image_path(): the ones the stamp details
+# window displays. The lookup itself is served by the automatic index backing
+# the UNIQUE constraint on detected_stamp_image_path.
+_LOOKUP_FIELDS = (
+    "id", "detected_stamp_image_path", "search_keywords", "country",
+    "title_suggestion", "estimated_price_range", "history_notes", "source_urls"
+)
+_LOOKUP_BY_PATH_SQL = (
+    f"SELECT {', '.join(_LOOKUP_FIELDS)} FROM stamps WHERE detected_stamp_image_path = ?"
+)
 
 def get_stamp_by_image_path(image_path: str) -> dict | None:
     """
@@ -120,31 +302,73 @@ def get_stamp_by_image_path(image_path: str) -> dict | None:
         image_path: The path to the detected stamp image.
 
     Returns:
-        A dictionary representing the stamp record if found, otherwise None.
-        'source_urls' will be a list (parsed from JSON).
+        A dictionary with the columns in _LOOKUP_FIELDS if found, otherwise None.
+        'source_urls' is always a list of strings (empty if none are stored).
     """
     try:
         conn = _get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM stamps WHERE detected_stamp_image_path = ?", (image_path,))
+        cursor.execute(_LOOKUP_BY_PATH_SQL, (image_path,))
         record = cursor.fetchone()
 
         if record:
-            record_dict = dict(record)
-            if record_dict.get("source_urls"):
-                try:
-                    record_dict["source_urls"] = json.loads(record_dict["source_urls"])
-                except json.JSONDecodeError:
-                    print(f"Warning: Could not parse source_urls JSON for {image_path}")
-                    record_dict["source_urls"] = [] # Default to empty list on error
+            record_dict = dict(zip(_LOOKUP_FIELDS, record))
+            try:
+                record_dict["source_urls"] = _parse_source_urls(record_dict["source_urls"])
+            except json.JSONDecodeError:
+                print(f"Warning: Could not parse source_urls JSON for {image_path}")
+                record_dict["source_urls"] = [] # Default to empty list on error
             return record_dict
         return None
     except sqlite3.Error as e:
         print(f"Database error retrieving record by image path: {e}")
         return None
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
+
+_SELECT_ALL_SQL = (
+    "SELECT id, original_image_ref, detected_stamp_image_path, search_keywords, "
+    "country, title_suggestion, estimated_price_range, history_notes, "
+    "source_urls, timestamp FROM stamps ORDER BY timestamp DESC"
+)
+
+def iter_all_stamps() -> Iterator[dict]:
+    """
+    Yields all records from the 'stamps' table one at a time, newest first.
+
+    Rows are read from the cursor as they are consumed rather than fetched
+    up front, so memory use stays constant regardless of collection size and
+    callers can start using the first record immediately.
+
+    Yields:
+        A dictionary per stamp record. 'source_urls' is always a list of strings.
+        Stops early (after printing the error) if a database error occurs.
+    """
+    try:
+        conn = _get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(_SELECT_ALL_SQL)
+
+        for (stamp_id, original_image_ref, detected_stamp_image_path, search_keywords,
+             country, title_suggestion, estimated_price_range, history_notes,
+             source_urls, timestamp) in cursor:
+            try:
+                source_urls = _parse_source_urls(source_urls)
+            except json.JSONDecodeError:
+                print(f"Warning: Could not parse source_urls JSON for ID {stamp_id}")
+                source_urls = [] # Default to empty list on error
+            yield {
+                "id": stamp_id,
+                "original_image_ref": original_image_ref,
+                "detected_stamp_image_path": detected_stamp_image_path,
+                "search_keywords": search_keywords,
+                "country": country,
+                "title_suggestion": title_suggestion,
+                "estimated_price_range": estimated_price_range,
+                "history_notes": history_notes,
+                "source_urls": source_urls,
+                "timestamp": timestamp,
+            }
+    except sqlite3.Error as e:
+        print(f"Database error retrieving all records: {e}")
 
 def get_all_stamps() -> list[dict]:
     """
@@ -154,30 +378,9 @@ def get_all_stamps() -> list[dict]:
         A list of dictionaries, where each dictionary represents a stamp record.
         'source_urls' will be a list (parsed from JSON).
         Returns an empty list if the table is empty or an error occurs.
+        Prefer iter_all_stamps() for large collections.
     """
-    records = []
-    try:
-        conn = _get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM stamps ORDER BY timestamp DESC")
-        rows = cursor.fetchall()
-
-        for row in rows:
-            record_dict = dict(row)
-            if record_dict.get("source_urls"):
-                try:
-                    record_dict["source_urls"] = json.loads(record_dict["source_urls"])
-                except json.JSONDecodeError:
-                    print(f"Warning: Could not parse source_urls JSON for ID {record_dict.get('id')}")
-                    record_dict["source_urls"] = [] # Default to empty list on error
-            records.append(record_dict)
-        return records
-    except sqlite3.Error as e:
-        print(f"Database error retrieving all records: {e}")
-        return [] # Return empty list on error
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
+    return list(iter_all_stamps())
 
 def main_test():
     """
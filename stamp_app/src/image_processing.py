@@ -1,7 +1,8 @@
 import cv2
 import numpy as np
 import os
-import uuid
+import secrets
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # This file will contain the logic for stamp detection from images.
@@ -17,6 +18,61 @@ MIN_CONTOUR_AREA = 1000  # Minimum area to be considered a potential stamp
 MAX_CONTOUR_AREA = 50000 # Maximum area
 ASPECT_RATIO_MIN = 0.5   # Minimum aspect ratio (width/height)
 ASPECT_RATIO_MAX = 2.0   # Maximum aspect ratio
+MIN_EXTENT = 0.7         # Minimum contour area / bounding box area (1.0 for an axis-aligned rectangle)
+
+# Edge/contour detection only needs rough geometry, so large images are
+# downscaled so that their longest side is at most this many pixels.
+# Crops are still taken from the full-resolution image.
+DETECTION_MAX_DIMENSION = 1000
+# When the detection image is downscaled by this factor or more, the separate
+# Gaussian blur pass before Canny is skipped.
+BLUR_SKIP_MAX_SCALE = 0.5
+
+# The DETECTED_STAMPS_DIR value last created, so later calls skip the mkdir
+# syscalls until the directory setting changes.
+_created_output_dir = None
+
+# Thread pool used to PNG-encode cropped stamps in parallel.
+# OpenCV releases the GIL while encoding, so the threads genuinely overlap.
+_encode_executor = None
+
+
+def _get_encode_executor() -> ThreadPoolExecutor:
+    """Returns the shared crop-encoding thread pool, creating it on first use."""
+    global _encode_executor
+    if _encode_executor is None:
+        _encode_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                             thread_name_prefix="stamp-encoder")
+    return _encode_executor
+
+
+def _finalize_stamp_bboxes(quad_bboxes: np.ndarray, scale: float,
+                           img_width: int, img_height: int) -> list[tuple[int, int, int, int]]:
+    """
+    Applies the final aspect-ratio check to the quadrilaterals' bounding boxes
+    and maps the survivors back to full-resolution coordinates, all as array
+    operations rather than a per-contour Python loop.
+
+    Args:
+        quad_bboxes: (N, 4) array of (x, y, w, h) in detection-image coordinates.
+        scale: Factor the detection image was downscaled by (1.0 if not at all).
+        img_width, img_height: Size of the full-resolution image, for clipping.
+
+    Returns:
+        A list of (x, y, w, h) tuples in full-resolution coordinates.
+    """
+    # Re-check the aspect ratio on each quadrilateral's own bounding box (scale-invariant)
+    aspect_ratios = quad_bboxes[:, 2] / np.maximum(quad_bboxes[:, 3], 1)
+    quad_bboxes = quad_bboxes[(aspect_ratios >= ASPECT_RATIO_MIN) & (aspect_ratios <= ASPECT_RATIO_MAX)]
+
+    if scale < 1.0:
+        x1 = np.maximum(0, np.rint(quad_bboxes[:, 0] / scale)).astype(np.int64)
+        y1 = np.maximum(0, np.rint(quad_bboxes[:, 1] / scale)).astype(np.int64)
+        x2 = np.minimum(img_width, np.rint((quad_bboxes[:, 0] + quad_bboxes[:, 2]) / scale)).astype(np.int64)
+        y2 = np.minimum(img_height, np.rint((quad_bboxes[:, 1] + quad_bboxes[:, 3]) / scale)).astype(np.int64)
+        quad_bboxes = np.stack([x1, y1, x2 - x1, y2 - y1], axis=1)
+
+    return [tuple(int(v) for v in bbox) for bbox in quad_bboxes]
 
 
 def detect_and_segment_stamps(uploaded_image_path: str) -> list[str]:
@@ -42,32 +98,53 @@ def detect_and_segment_stamps(uploaded_image_path: str) -> list[str]:
     detected_stamp_paths = []
     source_image_path = Path(uploaded_image_path)
 
-    # 1. Ensure output directory exists
-    try:
-        DETECTED_STAMPS_DIR.mkdir(parents=True, exist_ok=True)
-    except OSError as e:
-        # Consider logging this error instead of raising if preferred
-        # For now, raising helps signal a critical problem.
-        raise ValueError(f"Could not create detected stamps directory {DETECTED_STAMPS_DIR}: {e}")
-
-    # 2. Read the image
-    img = cv2.imread(str(source_image_path))
-    if img is None:
+    # 1. Ensure output directory exists (only checked when it changes)
+    global _created_output_dir
+    if _created_output_dir != DETECTED_STAMPS_DIR:
+        try:
+            DETECTED_STAMPS_DIR.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            # Consider logging this error instead of raising if preferred
+            # For now, raising helps signal a critical problem.
+            raise ValueError(f"Could not create detected stamps directory {DETECTED_STAMPS_DIR}: {e}")
+        _created_output_dir = DETECTED_STAMPS_DIR
+
+    # 2. Read the image as grayscale; detection never needs the color channels,
+    # so this skips a full-image BGR->gray conversion pass.
+    gray = cv2.imread(os.fspath(source_image_path), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
         # This is a common way to check if cv2.imread failed
         raise IOError(f"Failed to load image at path: {uploaded_image_path}. "
                       "Check if the file exists and is a valid image format.")
 
-    original_image_for_cropping = img.copy() # Keep a copy for cropping later
-
-    # 3. Convert to grayscale
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-    # 4. Apply Gaussian blur
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    # 3. Downscale for detection (no-op for images already small enough)
+    img_height, img_width = gray.shape[:2]
+    scale = min(1.0, DETECTION_MAX_DIMENSION / max(img_height, img_width))
+
+    # With an OpenCL device, run the per-pixel steps (resize, blur, Canny)
+    # through OpenCV's T-API on a UMat; otherwise they run on the CPU as usual.
+    use_opencl = cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+    if use_opencl:
+        gray = cv2.UMat(gray)
+
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    # Contour areas shrink with the square of the scale factor
+    min_area = MIN_CONTOUR_AREA * scale * scale
+    max_area = MAX_CONTOUR_AREA * scale * scale
+
+    # 4. Apply Gaussian blur, unless the INTER_AREA downscale already averaged
+    # blocks of at least 2x2 source pixels (which smooths noise just as well).
+    if scale <= BLUR_SKIP_MAX_SCALE:
+        blurred = gray
+    else:
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
 
     # 5. Perform edge detection (Canny)
     # Adjust thresholds as needed; these are common starting points
     edges = cv2.Canny(blurred, 50, 150)
+    if use_opencl:
+        edges = edges.get() # findContours needs a CPU-side array
 
     # 6. Find contours
     # RETR_EXTERNAL retrieves only the extreme outer contours.
@@ -75,43 +152,79 @@ def detect_and_segment_stamps(uploaded_image_path: str) -> list[str]:
     # and leaves only their end points.
     contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    # 7. Filter contours and process potential stamps
-    processed_stamps_data = [] # Changed from detected_stamp_paths
-    for i, contour in enumerate(contours):
-        area = cv2.contourArea(contour)
-
-        # Filter by area
-        if MIN_CONTOUR_AREA < area < MAX_CONTOUR_AREA:
-            # Approximate contour to a polygon
+    # 7. Filter contours down to stamp bounding boxes (full-resolution coordinates)
+    stamp_bboxes = []
+    if contours:
+        # Cheap area, aspect-ratio and rectangularity checks are done for all
+        # contours at once with NumPy so the costlier Douglas-Peucker polygon
+        # approximation only runs on survivors. A stamp's contour fills most of
+        # its bounding box; noise contours and non-rectangular shapes do not.
+        areas = np.fromiter((cv2.contourArea(c) for c in contours), dtype=np.float64, count=len(contours))
+        raw_bboxes = np.array([cv2.boundingRect(c) for c in contours], dtype=np.int64).reshape(-1, 4)
+        aspect_ratios = raw_bboxes[:, 2] / np.maximum(raw_bboxes[:, 3], 1)
+        extents = areas / np.maximum(raw_bboxes[:, 2] * raw_bboxes[:, 3], 1)
+        candidate_mask = (
+            (areas > min_area) & (areas < max_area)
+            & (aspect_ratios >= ASPECT_RATIO_MIN) & (aspect_ratios <= ASPECT_RATIO_MAX)
+            & (extents >= MIN_EXTENT)
+        )
+
+        # Polygon approximation has to run per contour in OpenCV; keep only quadrilaterals
+        quad_bboxes = []
+        for i in np.flatnonzero(candidate_mask):
+            contour = contours[i]
             perimeter = cv2.arcLength(contour, True)
             approx = cv2.approxPolyDP(contour, 0.02 * perimeter, True) # 0.02 is a common epsilon value
-
-            # Check if the approximated contour is a quadrilateral
             if len(approx) == 4:
-                x, y, w, h = cv2.boundingRect(approx) # These are relative to the processed image (e.g., gray)
-                                                      # but should be fine if no resizing was done before contour detection
-
-                # Additional filter: aspect ratio of the bounding box
-                aspect_ratio = float(w) / h
-                if ASPECT_RATIO_MIN <= aspect_ratio <= ASPECT_RATIO_MAX:
-                    # Crop the stamp from the original image (before any scaling for processing)
-                    cropped_stamp = original_image_for_cropping[y : y + h, x : x + w]
-
-                    # Create a unique filename
-                    original_filename_stem = source_image_path.stem
-                    unique_stamp_filename = f"{original_filename_stem}_stamp_{uuid.uuid4().hex[:8]}.png" # Save as PNG
-                    stamp_save_path = DETECTED_STAMPS_DIR / unique_stamp_filename
-
-                    # Save the cropped stamp
-                    try:
-                        cv2.imwrite(str(stamp_save_path), cropped_stamp)
-                        processed_stamps_data.append({
-                            'path': str(stamp_save_path),
-                            'bbox': (x, y, w, h)  # Bounding box from the original image scale
-                        })
-                    except Exception as e: # Catch cv2.imwrite errors specifically if possible
-                        # Log this error, but continue processing other contours
-                        print(f"Warning: Could not save detected stamp {stamp_save_path}: {e}")
+                quad_bboxes.append(cv2.boundingRect(approx)) # Relative to the downscaled detection image
+
+        if quad_bboxes:
+            stamp_bboxes = _finalize_stamp_bboxes(
+                np.array(quad_bboxes, dtype=np.int64), scale, img_width, img_height
+            )
+
+    processed_stamps_data = []
+    if not stamp_bboxes:
+        return processed_stamps_data
+
+    # 8. Only now load the color image, since there is something to crop
+    original_image_for_cropping = cv2.imread(os.fspath(source_image_path), cv2.IMREAD_COLOR)
+    if original_image_for_cropping is None:
+        raise IOError(f"Failed to load image at path: {uploaded_image_path}. "
+                      "Check if the file exists and is a valid image format.")
+
+    # 9. Crop each detected stamp and queue it for saving
+    original_filename_stem = source_image_path.stem
+    detected_stamps_dir = os.fspath(DETECTED_STAMPS_DIR) # Plain str, built once rather than per stamp
+    executor = _get_encode_executor()
+    pending_writes = []
+    for x, y, w, h in stamp_bboxes:
+        cropped_stamp = original_image_for_cropping[y : y + h, x : x + w]
+
+        # Create a unique filename. Random rather than a per-process counter, since
+        # the same sheet may be re-detected in a later run into the same directory.
+        unique_stamp_filename = f"{original_filename_stem}_stamp_{secrets.token_hex(4)}.png" # Save as PNG
+        stamp_save_path = os.path.join(detected_stamps_dir, unique_stamp_filename)
+
+        future = executor.submit(cv2.imencode, ".png", cropped_stamp) # OpenCV's default PNG settings, as cv2.imwrite used
+        pending_writes.append((future, stamp_save_path, (x, y, w, h)))
+
+    # 10. Write each encoded PNG as soon as it is ready, keeping results in
+    # detection order. Disk writes here overlap with the remaining encodes.
+    for future, stamp_save_path, bbox in pending_writes:
+        try:
+            encoded_ok, png_buffer = future.result()
+            if not encoded_ok:
+                raise IOError("cv2.imencode failed to encode the crop as PNG")
+            with open(stamp_save_path, "wb") as f:
+                f.write(png_buffer.tobytes())
+            processed_stamps_data.append({
+                'path': stamp_save_path,
+                'bbox': bbox  # Bounding box from the original image scale
+            })
+        except Exception as e: # Catch encoding and file write errors
+            # Log this error, but continue with the other stamps
+            print(f"Warning: Could not save detected stamp {stamp_save_path}: {e}")
 
     return processed_stamps_data
 
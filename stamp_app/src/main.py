@@ -1,12 +1,18 @@
+import hashlib
 import os
 import shutil
-import uuid
+import sys
+import tempfile
 from pathlib import Path
+import numpy as np
 import tkinter as tk
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from tkinter import filedialog, messagebox, ttk
-from PIL import Image, ImageTk, ImageDraw
+from PIL import Image, ImageTk
 from stamp_app.src.image_processing import detect_and_segment_stamps
-from stamp_app.src.db_utils import get_stamp_by_image_path, initialize_database # Added
+from stamp_app.src.db_utils import get_stamp_by_image_path, initialize_database
 
 # Main application script for the stamp scanner app.
 # This file will contain the core logic for the application.
@@ -16,15 +22,202 @@ from stamp_app.src.db_utils import get_stamp_by_image_path, initialize_database
 BASE_DIR = Path(__file__).resolve().parent.parent
 UPLOADED_IMAGES_DIR = BASE_DIR / "data" / "uploaded_images"
 ALLOWED_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+_ALLOWED_SUFFIXES = tuple(ALLOWED_EXTENSIONS) # For a single C-level str.endswith() check
+RESIZE_DEBOUNCE_MS = 150 # Quiet period after the last resize event before refitting the image
+CLICK_GRID_CELL_SIZE = 32 # Pixel size of the cells used to look up clicked stamps
 
 # Ensure UPLOADED_IMAGES_DIR exists at startup
 UPLOADED_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
 
+# Linux ioctl request number for FICLONE (copy-on-write clone on Btrfs/XFS)
+_FICLONE = 0x40049409
+
+DisplayFit = namedtuple("DisplayFit", ["width", "height", "scale_x", "scale_y"])
+
+
+def _compute_fit(label_width: int, label_height: int, img_width: int, img_height: int) -> DisplayFit:
+    """
+    Computes the largest size at which an img_width x img_height image fits in
+    the label while keeping its aspect ratio, plus the resulting scale factors
+    from image to display coordinates.
+    """
+    aspect_ratio = img_width / img_height
+
+    new_width = label_width
+    new_height = int(new_width / aspect_ratio)
+    if new_height > label_height:
+        new_height = label_height
+        new_width = int(new_height * aspect_ratio)
+
+    new_width = max(1, new_width)
+    new_height = max(1, new_height)
+    return DisplayFit(new_width, new_height, new_width / img_width, new_height / img_height)
+
+
+@lru_cache(maxsize=32)
+def _load_resized_image(image_path: str, mtime: float, width: int, height: int) -> Image.Image:
+    """
+    Loads an image from disk and LANCZOS-resizes it to (width, height).
+
+    Memoized so re-displaying the same file at the same size (e.g. reverting
+    to the un-annotated image after a detection with no results) skips both
+    the decode and the resize. 'mtime' is part of the key so a changed file
+    is reloaded. The returned image is shared and must not be modified.
+    """
+    with Image.open(image_path) as img:
+        # For JPEGs, let libjpeg decode at a reduced scale (1/2, 1/4 or 1/8) that is
+        # still at least twice the target size; LANCZOS then does the final step.
+        # No-op for other formats.
+        img.draft("RGB", (width * 2, height * 2))
+        return img.resize((width, height), Image.Resampling.LANCZOS)
+
+
+STAMP_LOOKUP_CACHE_SIZE = 256
+_stamp_lookup_cache = {} # detected_stamp_image_path -> record dict, oldest first
+
+
+def _cached_stamp_lookup(detected_stamp_image_path: str) -> dict | None:
+    """
+    Memoized get_stamp_by_image_path() for the click handler, so repeated
+    clicks on the same stamp don't query SQLite again. Stamp records are not
+    edited from the GUI, so a per-session cache is safe. The returned dict is
+    shared between calls and must not be modified.
+
+    Only found records are cached: None means either "no record yet" or a
+    database error (e.g. a locked database), and both may change later.
+    """
+    record = _stamp_lookup_cache.get(detected_stamp_image_path)
+    if record is not None:
+        return record
+    record = get_stamp_by_image_path(detected_stamp_image_path)
+    if record is not None:
+        if len(_stamp_lookup_cache) >= STAMP_LOOKUP_CACHE_SIZE:
+            del _stamp_lookup_cache[next(iter(_stamp_lookup_cache))] # Drop the oldest entry
+        _stamp_lookup_cache[detected_stamp_image_path] = record
+    return record
+
+
+def _draw_rectangle_outlines(base_rgb: np.ndarray, rects: list[tuple[int, int, int, int]],
+                             color=(255, 0, 0), width: int = 2,
+                             out: np.ndarray | None = None) -> Image.Image:
+    """
+    Returns an RGB image of base_rgb with the outline of every (x1, y1, x2, y2)
+    rectangle (inclusive corners) drawn in color, width pixels thick.
+
+    base_rgb is left untouched. If out (an array of the same shape) is given it
+    is reset to base_rgb and drawn into, so repeated redraws of the same base
+    reuse one buffer instead of converting and allocating a new image each time.
+
+    All outlines are rasterized together: each rectangle adds +1 over its outer
+    area and -1 over its inner area to a 2D difference array, and two cumulative
+    sums turn that into a per-pixel border count. This replaces one
+    ImageDraw.rectangle call per stamp with a handful of NumPy operations.
+    """
+    if out is None:
+        arr = base_rgb.copy()
+    else:
+        np.copyto(out, base_rgb)
+        arr = out
+    if not rects:
+        return Image.fromarray(arr)
+    img_height, img_width = arr.shape[:2]
+
+    boxes = np.array(rects, dtype=np.int64).reshape(-1, 4)
+    x1 = np.clip(boxes[:, 0], 0, img_width - 1)
+    y1 = np.clip(boxes[:, 1], 0, img_height - 1)
+    x2 = np.clip(boxes[:, 2], 0, img_width - 1)
+    y2 = np.clip(boxes[:, 3], 0, img_height - 1)
+
+    diff = np.zeros((img_height + 1, img_width + 1), dtype=np.int32)
+
+    def add_area(ax1, ay1, ax2, ay2, sign):
+        np.add.at(diff, (ay1, ax1), sign)
+        np.add.at(diff, (ay1, ax2 + 1), -sign)
+        np.add.at(diff, (ay2 + 1, ax1), -sign)
+        np.add.at(diff, (ay2 + 1, ax2 + 1), sign)
+
+    add_area(x1, y1, x2, y2, 1)
+    # Inner areas only exist for rectangles larger than twice the border width
+    ix1, iy1, ix2, iy2 = x1 + width, y1 + width, x2 - width, y2 - width
+    has_inner = (ix1 <= ix2) & (iy1 <= iy2)
+    add_area(ix1[has_inner], iy1[has_inner], ix2[has_inner], iy2[has_inner], -1)
+
+    border_count = diff.cumsum(axis=0).cumsum(axis=1)[:img_height, :img_width]
+    arr[border_count > 0] = color
+    return Image.fromarray(arr)
+
+
+def _load_stamp_thumbnail(stamp_image_path: str, max_dim: int = 200) -> Image.Image:
+    """
+    Returns the stamp image scaled to fit within max_dim x max_dim.
+
+    Scaled previews are cached on disk next to the crop as
+    '<stem>.thumb<max_dim>.png' and reused while they are at least as new as
+    the crop, so reopening a stamp's details skips the decode and resize.
+    Images already small enough are returned as is.
+
+    Raises:
+        FileNotFoundError: If the stamp image does not exist.
+    """
+    source_path = Path(stamp_image_path)
+    source_mtime = os.path.getmtime(source_path)
+    thumb_path = source_path.with_suffix(f".thumb{max_dim}.png")
+    try:
+        if os.path.getmtime(thumb_path) >= source_mtime:
+            return Image.open(thumb_path)
+    except OSError:
+        pass # No (readable) cached thumbnail yet
+
+    pil_image = Image.open(source_path)
+    img_width, img_height = pil_image.size
+    if img_width <= max_dim and img_height <= max_dim:
+        return pil_image
+
+    # BILINEAR is plenty for a small preview (LANCZOS is kept for the main viewer);
+    # thumbnail() also preserves the aspect ratio itself.
+    pil_image.thumbnail((max_dim, max_dim), Image.Resampling.BILINEAR)
+
+    try:
+        pil_image.save(thumb_path, "PNG", optimize=True)
+    except OSError as e:
+        print(f"Warning: Could not cache thumbnail {thumb_path}: {e}") # Still usable, just not cached
+    return pil_image
+
+
+def _clone_or_copy(source_path: Path, destination_path: Path):
+    """
+    Copies source_path to destination_path moving as few bytes as possible.
+
+    Tries a copy-on-write reflink via FICLONE on Linux first (no data copied,
+    but the destination is still an independent file), then falls back to
+    shutil.copy2 (which itself uses sendfile/fcopyfile where available).
+    Hard links are deliberately not used: they would share the inode with
+    the user's original, so editing that file in place would silently change
+    the stored upload.
+
+    Raises:
+        OSError: If all strategies fail.
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            import fcntl
+            with open(source_path, "rb") as src, open(destination_path, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            shutil.copystat(source_path, destination_path)
+            return
+        except OSError:
+            pass # Filesystem without reflink support; copy2 below overwrites the empty file
+
+    shutil.copy2(source_path, destination_path)
+
+
 def handle_image_upload(image_path: str) -> str:
     """
     Handles the upload of an image file. (Content from previous step, unchanged)
     Validates the image file, creates a unique filename, copies it to the
     'uploaded_images' directory, and returns the path to the saved image.
+    The filename includes a hash of the file's content, so uploading the same
+    image again returns the existing copy without copying anything.
     Args:
         image_path: The path to the image file on the local system.
     Returns:
@@ -33,22 +226,41 @@ def handle_image_upload(image_path: str) -> str:
         FileNotFoundError: If the image_path does not point to an existing file.
         ValueError: If the file is not a recognized image type (based on extension)
                     or if the target directory cannot be created.
-        IOError: If an error occurs during file copying.
+        IOError: If an error occurs while reading or copying the file.
     """
     source_path = Path(image_path)
     if not source_path.is_file():
         raise FileNotFoundError(f"Source image file not found at: {image_path}")
-    if source_path.suffix.lower() not in ALLOWED_EXTENSIONS:
+    if not os.fspath(image_path).lower().endswith(_ALLOWED_SUFFIXES):
         raise ValueError(
             f"Invalid image file type: {source_path.suffix}. "
             f"Allowed types are: {', '.join(ALLOWED_EXTENSIONS)}"
         )
     target_dir = UPLOADED_IMAGES_DIR # Already created at startup
-    unique_filename = f"{source_path.stem}_{uuid.uuid4().hex}{source_path.suffix}"
+    content_hash = hashlib.blake2b(digest_size=8)
+    try:
+        with open(source_path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                content_hash.update(chunk)
+    except IOError as e:
+        raise IOError(f"Error reading file {source_path}: {e}")
+    unique_filename = f"{source_path.stem}_{content_hash.hexdigest()}{source_path.suffix}"
     destination_path = target_dir / unique_filename
+    if destination_path.exists():
+        return str(destination_path) # Same content was uploaded before
+    # Copy under a temporary name and rename it into place, so a failed or
+    # interrupted copy never leaves a partial file under the content-hash name
+    # (which the exists() check above would otherwise trust).
+    temp_path = None
     try:
-        shutil.copy2(source_path, destination_path)
+        temp_fd, temp_name = tempfile.mkstemp(dir=target_dir, prefix=".upload-", suffix=".tmp")
+        os.close(temp_fd)
+        temp_path = Path(temp_name)
+        _clone_or_copy(source_path, temp_path)
+        os.replace(temp_path, destination_path)
     except IOError as e:
+        if temp_path is not None:
+            temp_path.unlink(missing_ok=True)
         raise IOError(f"Error copying file from {source_path} to {destination_path}: {e}")
     return str(destination_path)
 
@@ -65,6 +277,17 @@ class StampScannerApp(tk.Tk):
         self.tk_image_with_rects = None # To store image with rectangles
         self.detected_stamps_data = [] # List of {'path': '...', 'bbox': (x,y,w,h)}
         self.displayed_stamp_rects_info = [] # List of {'scaled_bbox': (x1,y1,x2,y2), 'original_data': ...}
+        self._click_grid = {} # (cell_x, cell_y) -> indices into displayed_stamp_rects_info overlapping that cell
+        self._display_base = None # original_pil_image resized once to fit the label; rectangles are drawn on copies
+        self._display_base_label_size = None # Label (width, height) that _display_base was fitted to
+        self._display_base_rgb = None # _display_base as an RGB array, converted once per base
+        self._annotated_rgb = None # Reusable buffer the rectangles are drawn into
+        self._fit = None # DisplayFit of original_pil_image into the label, matching _display_base
+        self._resize_after_id = None # Pending debounced rebuild after a label resize
+        # Background work (uploads, stamp detection) runs here so the Tk main loop stays responsive
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="stamp-app")
+        self._detection_future = None # Set while a detection is running in the background
+        self._upload_future = None # Set while an opened image is being copied in the background
 
         # --- UI Elements ---
         # Top frame for buttons
@@ -94,12 +317,13 @@ class StampScannerApp(tk.Tk):
         self.image_label = ttk.Label(content_frame, text="No image selected.")
         self.image_label.pack(pady=10, fill=tk.BOTH, expand=True)
         self.image_label.bind("<Button-1>", self.on_image_click) # Bind click event
+        self.image_label.bind("<Configure>", self._on_image_label_configure) # Refit image on resize
         
         # Status bar
         self.status_bar = ttk.Label(self, text="Ready", relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
         
-        initialize_database() # Initialize DB at startup
+        initialize_database() # Initialize DB at startup; also opens the main thread's connection
 
     def open_image_dialog(self):
         """
@@ -109,6 +333,8 @@ class StampScannerApp(tk.Tk):
         # Clear previous detection results
         self.detected_stamps_data = []
         self.displayed_stamp_rects_info = []
+        self._click_grid = {}
+        self._cancel_pending_resize() # The new image is fitted to the current size on display
         
         self.status_bar.config(text="Opening file dialog...")
         filetypes = (("Image files", "*.jpg *.jpeg *.png"), ("All files", "*.*"))
@@ -124,8 +350,24 @@ class StampScannerApp(tk.Tk):
         self.original_selected_path = filepath
         self.status_bar.config(text=f"Selected: {os.path.basename(filepath)}")
 
+        # Copying can be slow (large photos, network shares), so it runs in the
+        # background and the result is picked up by _poll_upload on the Tk thread.
+        self.detect_button.config(state=tk.DISABLED)
+        future = self._executor.submit(handle_image_upload, filepath)
+        self._upload_future = future
+        self.after(50, self._poll_upload, future)
+
+    def _poll_upload(self, future):
+        """Waits for a background upload from the Tk main loop, then displays the image."""
+        if not future.done():
+            self.after(50, self._poll_upload, future)
+            return
+        if future is not self._upload_future:
+            return # Superseded by a later upload
+        self._upload_future = None
+
         try:
-            self.current_image_path = handle_image_upload(filepath)
+            self.current_image_path = future.result()
             self.status_bar.config(text=f"Image processed: {os.path.basename(self.current_image_path)}")
             
             self.display_image(self.current_image_path) # This will now enable the button
@@ -148,11 +390,13 @@ class StampScannerApp(tk.Tk):
             self.status_bar.config(text="Error: Unexpected error.")
             self.detect_button.config(state=tk.DISABLED)
 
-    def display_image(self, image_path_to_display, draw_boxes_on_this_image=None):
+    def display_image(self, image_path_to_display, draw_boxes_on_this_image=None, skip_resize=False):
         """
         Loads an image, optionally draws boxes, scales, and displays it.
         If draw_boxes_on_this_image is provided, it's used as the base for drawing.
         Otherwise, image_path_to_display is loaded.
+        If skip_resize is True, draw_boxes_on_this_image is assumed to already be
+        fitted to the label (e.g. drawn on _display_base) and is shown as is.
         """
         try:
             if draw_boxes_on_this_image:
@@ -161,34 +405,39 @@ class StampScannerApp(tk.Tk):
                 display_pil_image = draw_boxes_on_this_image 
             else:
                 # This is a fresh load (e.g., after open_image_dialog or clearing boxes)
+                # Image.open is lazy; only the header is read here to get the size.
                 self.original_pil_image = Image.open(image_path_to_display)
-                display_pil_image = self.original_pil_image.copy()
+                display_pil_image = self.original_pil_image
 
-            self.image_label.update_idletasks()
-            label_width = self.image_label.winfo_width()
-            label_height = self.image_label.winfo_height()
+            if draw_boxes_on_this_image and skip_resize:
+                resized_image = display_pil_image
+            else:
+                self.image_label.update_idletasks()
+                label_width = self.image_label.winfo_width()
+                label_height = self.image_label.winfo_height()
 
-            if label_width <= 1 or label_height <= 1:
-                label_width, label_height = 600, 400 # Default reasonable size for first display
+                if label_width <= 1 or label_height <= 1:
+                    label_width, label_height = 600, 400 # Default reasonable size for first display
 
-            img_width, img_height = display_pil_image.size
-            aspect_ratio = img_width / img_height
-            
-            new_width = label_width
-            new_height = int(new_width / aspect_ratio)
-            if new_height > label_height:
-                new_height = label_height
-                new_width = int(new_height * aspect_ratio)
-            
-            new_width = max(1, new_width)
-            new_height = max(1, new_height)
+                img_width, img_height = display_pil_image.size
+                fit = _compute_fit(label_width, label_height, img_width, img_height)
 
-            resized_image = display_pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Store the scaled dimensions and factors if needed elsewhere,
-            # but for drawing, we'll scale within draw_stamp_rectangles.
-            # self.scaled_image_width = new_width 
-            # self.scaled_image_height = new_height
+                if draw_boxes_on_this_image:
+                    # In-memory annotated images aren't cached: they change on every detection
+                    resized_image = display_pil_image.resize((fit.width, fit.height), Image.Resampling.LANCZOS)
+                else:
+                    resized_image = _load_resized_image(
+                        str(image_path_to_display), os.path.getmtime(image_path_to_display),
+                        fit.width, fit.height
+                    )
+                    # Keep the fitted image as the base that rectangles get drawn on,
+                    # so detection never has to touch the full-resolution image.
+                    # The fit is cached too, so drawing reuses its scale factors.
+                    self._fit = fit
+                    self._display_base = resized_image
+                    self._display_base_rgb = np.asarray(resized_image.convert("RGB"))
+                    self._annotated_rgb = np.empty_like(self._display_base_rgb)
+                    self._display_base_label_size = (label_width, label_height)
 
             self.tk_image = ImageTk.PhotoImage(resized_image)
             self.image_label.config(image=self.tk_image, text="")
@@ -198,7 +447,9 @@ class StampScannerApp(tk.Tk):
                  self.status_bar.config(text=f"Displayed: {os.path.basename(image_path_to_display)}")
             
             if hasattr(self, 'detect_button'): # Ensure button exists
-                self.detect_button.config(state=tk.NORMAL if self.current_image_path else tk.DISABLED)
+                can_detect = (self.current_image_path and self._detection_future is None
+                              and self._upload_future is None)
+                self.detect_button.config(state=tk.NORMAL if can_detect else tk.DISABLED)
 
         except FileNotFoundError:
             messagebox.showerror("Error", f"Image file not found at: {image_path_to_display}")
@@ -215,16 +466,38 @@ class StampScannerApp(tk.Tk):
         if not self.current_image_path or not self.original_pil_image:
             messagebox.showerror("Error", "Please open an image first.")
             return
+        if self._detection_future is not None or self._upload_future is not None:
+            return # A detection or an upload is already running
             
         # Clear previous results
         self.detected_stamps_data = []
         self.displayed_stamp_rects_info = []
+        self._click_grid = {}
 
         self.status_bar.config(text="Detecting stamps...")
-        self.update_idletasks() # Ensure status bar updates
+        self.detect_button.config(state=tk.DISABLED) # Re-enabled once detection finishes
+
+        future = self._executor.submit(detect_and_segment_stamps, self.current_image_path)
+        self._detection_future = future
+        self.after(50, self._poll_detection, future, self.current_image_path)
+
+    def _poll_detection(self, future, image_path):
+        """
+        Checks on a background detection from the Tk main loop and, once it is
+        done, shows the result. All widget updates happen here, on the main thread.
+        """
+        if not future.done():
+            self.after(50, self._poll_detection, future, image_path)
+            return
+
+        self._detection_future = None
+        can_detect = self.current_image_path and self._upload_future is None
+        self.detect_button.config(state=tk.NORMAL if can_detect else tk.DISABLED)
+        if image_path != self.current_image_path:
+            return # A different image was opened meanwhile; drop the stale result
 
         try:
-            detected_stamps_data_result = detect_and_segment_stamps(self.current_image_path)
+            detected_stamps_data_result = future.result()
             self.detected_stamps_data = detected_stamps_data_result # Store full data
 
             if self.detected_stamps_data:
@@ -248,50 +521,23 @@ class StampScannerApp(tk.Tk):
 
 
     def draw_stamp_rectangles(self, stamps_data_to_draw): # Renamed param
-        if not self.original_pil_image:
+        if not self.original_pil_image or self._display_base is None or self._fit is None:
             messagebox.showerror("Error", "Original image not available for drawing.")
             return
 
         self.displayed_stamp_rects_info = [] # Clear old scaled rect info
-        image_to_draw_on = self.original_pil_image.copy()
-        draw = ImageDraw.Draw(image_to_draw_on)
 
-        # Get current display dimensions for scaling bounding boxes
-        # This is crucial for accurate click detection on the displayed image
-        self.image_label.update_idletasks()
-        label_width = self.image_label.winfo_width()
-        label_height = self.image_label.winfo_height()
-
-        if label_width <= 1 or label_height <= 1: # Should not happen if image is displayed
-            label_width, label_height = self.image_label.master.winfo_width(), self.image_label.master.winfo_height()
-
-
-        orig_img_width, orig_img_height = self.original_pil_image.size
-        
-        # Calculate scale factors based on how original_pil_image was scaled to fit label_width/label_height
-        # This mirrors the logic in display_image's resizing
-        aspect_ratio = orig_img_width / orig_img_height
-        
-        scaled_display_width = label_width
-        scaled_display_height = int(scaled_display_width / aspect_ratio)
-        if scaled_display_height > label_height:
-            scaled_display_height = label_height
-            scaled_display_width = int(scaled_display_height * aspect_ratio)
-        
-        scaled_display_width = max(1, scaled_display_width)
-        scaled_display_height = max(1, scaled_display_height)
-
-        scale_x = scaled_display_width / orig_img_width
-        scale_y = scaled_display_height / orig_img_height
+        # Scale factors from original image coordinates (detection bboxes) to the
+        # displayed image, as computed when _display_base was fitted.
+        # This is crucial for accurate click detection.
+        scale_x = self._fit.scale_x
+        scale_y = self._fit.scale_y
 
         for stamp_item in stamps_data_to_draw:
             x, y, w, h = stamp_item['bbox']
             
-            # Draw on the copy of the original image (unscaled coordinates)
-            draw.rectangle([(x, y), (x + w, y + h)], outline="red", width=2)
-            
-            # Calculate scaled coordinates for click detection
-            # These are relative to the top-left of the image_label
+            # Calculate scaled coordinates, used both for drawing and click detection
+            # These are relative to the top-left of the displayed image
             scaled_x1 = int(x * scale_x)
             scaled_y1 = int(y * scale_y)
             scaled_x2 = int((x + w) * scale_x)
@@ -301,8 +547,60 @@ class StampScannerApp(tk.Tk):
                 'scaled_bbox': (scaled_x1, scaled_y1, scaled_x2, scaled_y2),
                 'original_data': stamp_item 
             })
-            
-        self.display_image(self.current_image_path, draw_boxes_on_this_image=image_to_draw_on)
+
+        self._build_click_grid()
+
+        # Draw all outlines at once on a copy of the already-fitted display image
+        # rather than on the full-resolution original.
+        image_to_draw_on = _draw_rectangle_outlines(
+            self._display_base_rgb, [info['scaled_bbox'] for info in self.displayed_stamp_rects_info],
+            out=self._annotated_rgb
+        )
+
+        # Already display-sized, so skip display_image's LANCZOS pass
+        self.display_image(self.current_image_path, draw_boxes_on_this_image=image_to_draw_on, skip_resize=True)
+
+    def _build_click_grid(self):
+        """
+        Buckets displayed_stamp_rects_info into a uniform grid of
+        CLICK_GRID_CELL_SIZE pixel cells, so a click only has to test the
+        rectangles overlapping its cell instead of every detected stamp.
+        """
+        self._click_grid = {}
+        for idx, item_info in enumerate(self.displayed_stamp_rects_info):
+            scaled_x1, scaled_y1, scaled_x2, scaled_y2 = item_info['scaled_bbox']
+            for cell_x in range(scaled_x1 // CLICK_GRID_CELL_SIZE, scaled_x2 // CLICK_GRID_CELL_SIZE + 1):
+                for cell_y in range(scaled_y1 // CLICK_GRID_CELL_SIZE, scaled_y2 // CLICK_GRID_CELL_SIZE + 1):
+                    self._click_grid.setdefault((cell_x, cell_y), []).append(idx)
+
+    def _on_image_label_configure(self, event):
+        """
+        Schedules a rebuild of the display base when the image label changes size.
+        Resize events arrive continuously while the window is dragged, so the
+        rebuild is debounced and only runs once the size has settled.
+        """
+        self._cancel_pending_resize()
+        if not self.current_image_path or (event.width, event.height) == self._display_base_label_size:
+            return # Nothing shown, or back at the size the base was built for
+        self._resize_after_id = self.after(RESIZE_DEBOUNCE_MS, self._rebuild_display_base)
+
+    def _cancel_pending_resize(self):
+        """Cancels a scheduled _rebuild_display_base, if any."""
+        if self._resize_after_id is not None:
+            self.after_cancel(self._resize_after_id)
+            self._resize_after_id = None
+
+    def _rebuild_display_base(self):
+        """Refits the current image to the label and redraws any detected stamps."""
+        self._resize_after_id = None
+        if not self.current_image_path:
+            return
+        current_size = (self.image_label.winfo_width(), self.image_label.winfo_height())
+        if current_size == self._display_base_label_size:
+            return # The drag ended where it started; the base is still valid
+        self.display_image(self.current_image_path)
+        if self.detected_stamps_data:
+            self.draw_stamp_rectangles(self.detected_stamps_data)
 
     def on_image_click(self, event):
         click_x, click_y = event.x, event.y
@@ -328,7 +626,9 @@ class StampScannerApp(tk.Tk):
         adjusted_click_x = click_x - offset_x
         adjusted_click_y = click_y - offset_y
 
-        for item_info in self.displayed_stamp_rects_info:
+        click_cell = (adjusted_click_x // CLICK_GRID_CELL_SIZE, adjusted_click_y // CLICK_GRID_CELL_SIZE)
+        for idx in self._click_grid.get(click_cell, ()):
+            item_info = self.displayed_stamp_rects_info[idx]
             scaled_x1, scaled_y1, scaled_x2, scaled_y2 = item_info['scaled_bbox']
             
             # Compare with adjusted click coordinates
@@ -343,7 +643,7 @@ class StampScannerApp(tk.Tk):
                 self.status_bar.config(text=status_text)
                 self.update_idletasks()
 
-                stamp_details_from_db = get_stamp_by_image_path(detected_stamp_image_path)
+                stamp_details_from_db = _cached_stamp_lookup(detected_stamp_image_path)
                 
                 if stamp_details_from_db:
                     self.status_bar.config(text=f"Displaying details for: {os.path.basename(detected_stamp_image_path)}")
@@ -356,6 +656,12 @@ class StampScannerApp(tk.Tk):
         # If no rectangle was clicked, you might want to clear the status or specific info
         # self.status_bar.config(text="Clicked on image area.")
 
+    def _copy_to_clipboard(self, text):
+        """Replaces the clipboard contents with text."""
+        self.clipboard_clear()
+        self.clipboard_append(text)
+        self.status_bar.config(text="Copied to clipboard.")
+
     def show_stamp_details_window(self, db_details, original_detection_data):
         details_window = tk.Toplevel(self)
         details_window.title(f"Stamp Details: {os.path.basename(original_detection_data['path'])}")
@@ -370,20 +676,7 @@ class StampScannerApp(tk.Tk):
         image_frame.pack(pady=10)
         
         try:
-            pil_image = Image.open(original_detection_data['path'])
-            img_width, img_height = pil_image.size
-            max_dim = 200
-            
-            if img_width > max_dim or img_height > max_dim:
-                aspect_ratio = img_width / img_height
-                if img_width > img_height:
-                    new_width = max_dim
-                    new_height = int(new_width / aspect_ratio)
-                else:
-                    new_height = max_dim
-                    new_width = int(new_height * aspect_ratio)
-                pil_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
+            pil_image = _load_stamp_thumbnail(original_detection_data['path'])
             stamp_tk_image = ImageTk.PhotoImage(pil_image)
             image_detail_label = ttk.Label(image_frame, image=stamp_tk_image)
             image_detail_label.image = stamp_tk_image # Keep reference
@@ -403,14 +696,12 @@ class StampScannerApp(tk.Tk):
             nonlocal row_idx
             ttk.Label(info_frame, text=label_text, font=('Helvetica', 10, 'bold')).grid(row=row_idx, column=0, sticky=tk.W, padx=5, pady=2)
             
-            # Use Text widget for potentially long values to allow scrolling and copying
-            if isinstance(value_text, str) and len(value_text) > 70: # Heuristic for long text
-                text_val_widget = tk.Text(info_frame, height=3, width=50, wrap=tk.WORD, relief=tk.FLAT, borderwidth=0)
-                text_val_widget.insert(tk.END, value_text)
-                text_val_widget.config(state=tk.DISABLED, highlightthickness=0) # Read-only, remove border
-                text_val_widget.grid(row=row_idx, column=1, sticky=tk.EW, padx=5, pady=2)
-            else:
-                 ttk.Label(info_frame, text=str(value_text), wraplength=350).grid(row=row_idx, column=1, sticky=tk.W, padx=5, pady=2)
+            # A wrapping ttk.Label is enough for these DB fields and much cheaper to
+            # create than a tk.Text; double-click copies the value instead.
+            value_str = str(value_text)
+            value_label = ttk.Label(info_frame, text=value_str, wraplength=350)
+            value_label.grid(row=row_idx, column=1, sticky=tk.W, padx=5, pady=2)
+            value_label.bind("<Double-Button-1>", lambda event, text=value_str: self._copy_to_clipboard(text))
             row_idx += 1
 
         add_detail_row("File Path:", os.path.basename(original_detection_data['path']))
@@ -426,13 +717,8 @@ class StampScannerApp(tk.Tk):
             history = db_details.get('history_notes', 'N/A')
             add_detail_row("History:", history)
 
-            source_urls_data = db_details.get('source_urls')
-            if isinstance(source_urls_data, list) and source_urls_data: # Should be list from db_utils
-                add_detail_row("Sources:", "\n".join(source_urls_data))
-            elif isinstance(source_urls_data, str) and source_urls_data: # Fallback if it's a string
-                 add_detail_row("Sources:", source_urls_data)
-            else:
-                add_detail_row("Sources:", "N/A")
+            # db_utils always returns 'source_urls' as a list of strings
+            add_detail_row("Sources:", "\n".join(db_details.get('source_urls') or []) or "N/A")
         else:
             ttk.Label(info_frame, text="No further details found in the database for this stamp.", font=('Helvetica', 10, 'italic')).grid(row=row_idx, column=0, columnspan=2, sticky=tk.W, padx=5, pady=10)
             row_idx+=1
@@ -1,14 +1,195 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
 import requests
-from bs4 import BeautifulSoup
+import lxml.etree
+import lxml.html
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from requests.adapters import HTTPAdapter
 from urllib.parse import urljoin, quote_plus
+from urllib3.util.retry import Retry
+
+# aiohttp is optional: it lets fetch_stamp_information_many() run all of its
+# searches on one event loop. Without it, the searches run on worker threads.
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# orjson is an optional, faster drop-in for reading and writing the on-disk
+# search result cache. Its JSONDecodeError subclasses json.JSONDecodeError.
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps_bytes = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    def _json_dumps_bytes(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
 
 # This file will handle fetching stamp information from online resources.
 # It will include functions for querying web APIs or scraping websites
 # to gather details about identified stamps.
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True, frozen=True)
+class StampResult:
+    """
+    One search result for a stamp.
+
+    Attributes:
+        title: Title of the search result.
+        url: Absolute URL of the search result.
+        snippet: A short description or snippet.
+        estimated_price_range: Placeholder, defaults to "Not found".
+        country: Placeholder, defaults to "Not found".
+        history_notes: Placeholder, defaults to "Not found".
+    """
+    title: str
+    url: str
+    snippet: str
+    estimated_price_range: str = "Not found"
+    country: str = "Not found"
+    history_notes: str = "Not found"
+
+
+def _has_class_xpath(*class_names: str) -> str:
+    """
+    Builds an XPath predicate that is true when an element's class attribute
+    contains any of class_names as a whole whitespace-separated token.
+    """
+    return " or ".join(
+        f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')" for name in class_names
+    )
+
+# Classes of the <div>s that hold one search result each
+_RESULT_CONTAINER_CLASSES = frozenset({"g", "Gx5Zad", "hlcw0c", "tF2Cxc"})
+
+# Precompiled once at import; each call is a single C-level tree traversal.
+# The leading [@class] predicate is a cheap attribute-existence test, so the
+# string building in the class-token check only runs for divs with a class.
+_BASE_HREF_XPATH = lxml.etree.XPath("(//base/@href)[1]")
+# A result's title (first <h3>), link (href of the first <a>; only the first
+# link counts, as before) and snippet <div>, fetched together in one call per
+# container. The union comes back in document order, with at most one of
+# each: the href as a string, the title as an h3 element and the snippet as
+# a div element.
+_RESULT_PARTS_XPATH = lxml.etree.XPath(
+    "(.//h3)[1] | (.//a)[1]/@href"
+    f" | (.//div[@class][{_has_class_xpath('VwiC3b', 's3v9rd', 'BNeawe')} or @class = 'UPmit AP7Wnd'])[1]"
+)
+
+APP_BASE_DIR = Path(__file__).resolve().parent.parent
+SEARCH_CACHE_EXPIRE_SECONDS = 3600 # How long cached search results (memory and disk) stay valid
+SEARCH_CACHE_DIR = APP_BASE_DIR / "data" / "search_cache"
+_created_search_cache_dir = None # SEARCH_CACHE_DIR value last created; mkdir runs again if it changes
+HTML_CHUNK_SIZE = 65536 # Bytes handed to the incremental HTML parser at a time
+RETRY_AFTER_MAX_SECONDS = 10 # Longest Retry-After wait honored before retrying a search
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.3
+RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)
+SEARCH_MEMORY_CACHE_SIZE = 256
+
+# (search_keywords, target_url) -> (time stored, results), oldest first.
+# Only non-empty results are kept, so an empty page (e.g. a captcha) is
+# fetched again next time rather than remembered for the whole session.
+_search_memory_cache = {}
+_search_memory_cache_lock = threading.Lock()
+
+_DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    # No Accept-Encoding here: requests and aiohttp already advertise every
+    # encoding they can decode (gzip/deflate, plus br when brotli is installed).
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# One process-wide session, so repeated searches against the same host reuse
+# pooled keep-alive connections instead of paying a new TCP+TLS handshake
+# on every call.
+_SESSION = requests.Session()
+
+class _CappedRetry(Retry):
+    """
+    Retry that honors Retry-After for at most RETRY_AFTER_MAX_SECONDS.
+
+    The request timeout doesn't cover the Retry-After sleep, so an uncapped
+    wait (urllib3 allows up to 6 hours, or doesn't cap it at all before 2.6.3)
+    could block a lookup for an hour after a single 429. Retry.new() builds
+    each retry step with type(self), so the cap holds for every attempt.
+    """
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, RETRY_AFTER_MAX_SECONDS)
+
+# Transient failures (rate limiting, overloaded or restarting servers) are
+# retried with exponential backoff (0.3s, 0.6s, 1.2s), honoring a capped
+# Retry-After, before the error reaches fetch_stamp_information().
+_HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=10, pool_maxsize=50,
+    max_retries=_CappedRetry(
+        total=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_FORCELIST,
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+    )
+)
+_SESSION.mount("https://", _HTTP_ADAPTER)
+_SESSION.mount("http://", _HTTP_ADAPTER)
+# Set once on the session, so requests has no per-call headers to merge in
+_SESSION.headers.update(_DEFAULT_HEADERS)
+
+
+def _iter_result_containers(doc):
+    """
+    Lazily yields the result container <div>s of doc in document order.
+
+    Unlike a document-wide XPath query, nothing past the last container the
+    caller consumes is visited, so stopping after the first few results
+    skips the rest of the page.
+    """
+    for element in doc.iter("div"):
+        class_attr = element.get("class")
+        # str.split() plus a frozenset test measured faster than a precompiled
+        # whole-token regex over the attribute (re.search is ~2x slower on
+        # typical class strings), and \b-style regexes would wrongly match
+        # hyphenated classes such as "g-blk".
+        if class_attr and not _RESULT_CONTAINER_CLASSES.isdisjoint(class_attr.split()):
+            yield element
+
+
+def _clean_search_keywords(search_keywords: str, target_url: str) -> str:
+    """
+    Returns search_keywords without surrounding whitespace, or "" if the
+    search can't succeed: blank keywords or a target_url that isn't
+    http(s). Checked before any URL building or network access, so bad
+    input never waits out a request timeout.
+    """
+    if not search_keywords or not target_url or not target_url.startswith(("http://", "https://")):
+        return ""
+    return search_keywords.strip()
+
+
+def _joined_text(element) -> str:
+    """Returns the element's stripped text nodes joined by single spaces."""
+    return " ".join(filter(None, (text.strip() for text in element.itertext())))
+
+
 def fetch_stamp_information(
     stamp_image_path: str, search_keywords: str, target_url: str
-) -> list[dict]:
+) -> list[StampResult]:
     """
     Fetches stamp information from a target URL based on search keywords.
 
@@ -24,45 +205,221 @@ def fetch_stamp_information(
                     will append a search query parameter, typically '?q='.
 
     Returns:
-        A list of dictionaries, where each dictionary contains:
-        - 'title': Title of the search result.
-        - 'url': Absolute URL of the search result.
-        - 'snippet': A short description or snippet.
-        - 'estimated_price_range': Placeholder, defaults to "Not found".
-        - 'country': Placeholder, defaults to "Not found".
-        - 'history_notes': Placeholder, defaults to "Not found".
+        A list of up to 5 StampResult records.
         Returns an empty list if no results are found or an error occurs.
     """
-    results = []
-    if not search_keywords or not target_url:
-        return results
+    search_keywords = _clean_search_keywords(search_keywords, target_url)
+    if not search_keywords:
+        return [] # Nothing to search for, or not a URL a request could succeed against
 
-    # Construct the search URL. This is a common pattern for many search engines.
-    # We use quote_plus to URL-encode the search keywords.
     try:
-        # Basic check to see if target_url already contains query params
-        if "?" in target_url:
-            search_url = f"{target_url}&q={quote_plus(search_keywords)}"
-        else:
-            search_url = f"{target_url}?q={quote_plus(search_keywords)}"
+        cached_results = _fetch_search_results(search_keywords, target_url)
+    except requests.exceptions.RequestException as e:
+        logger.error("Error fetching URL %s: %s", _build_search_url(search_keywords, target_url), e)
+        return []
+    except Exception as e:
+        logger.error("An unexpected error occurred during request: %s", e)
+        return []
+
+    # The records are frozen, so the cached ones can be handed out as is
+    return list(cached_results)
+
+
+def _fetch_search_results(search_keywords: str, target_url: str) -> tuple[StampResult, ...]:
+    """
+    Fetches and parses the results page for (search_keywords, target_url),
+    answering from the search result caches when possible so retrying the
+    same search skips the network and the parser.
 
-        print(f"Fetching information from: {search_url}")
+    Request errors are raised to the caller and are not cached, so a failed
+    search is retried.
+    """
+    cached_results = _get_cached_search_results(search_keywords, target_url)
+    if cached_results is not None:
+        return cached_results
+
+    search_url = _build_search_url(search_keywords, target_url)
+    logger.debug("Fetching information from: %s", search_url)
 
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(search_url, headers=headers, timeout=10)
+    # Stream the body so the page is parsed while it is still arriving,
+    # rather than buffering all of it in response.content first.
+    with _SESSION.get(search_url, timeout=10, stream=True) as response:
         response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching URL {search_url}: {e}")
-        return results
-    except Exception as e:
-        print(f"An unexpected error occurred during request: {e}")
-        return results
+        # When the server declares a charset, pass it on so lxml doesn't have to
+        # guess the encoding from the bytes.
+        declared_encoding = response.encoding if "charset" in response.headers.get("Content-Type", "").lower() else None
+        doc = _parse_html_chunks(response.iter_content(HTML_CHUNK_SIZE), declared_encoding)
+
+    results = tuple(_parse_search_results(doc, target_url))
+    _store_search_results(search_keywords, target_url, results)
+    return results
+
+
+def _get_cached_search_results(search_keywords: str, target_url: str) -> tuple[StampResult, ...] | None:
+    """
+    Returns cached results for a search, or None on a miss.
+
+    Looks in memory first, then in the on-disk cache written by earlier runs
+    (which is copied into memory on a hit). Entries older than
+    SEARCH_CACHE_EXPIRE_SECONDS are ignored in both tiers.
+    """
+    key = (search_keywords, target_url)
+    with _search_memory_cache_lock:
+        entry = _search_memory_cache.get(key)
+    if entry is not None:
+        stored_at, results = entry
+        if time.time() - stored_at <= SEARCH_CACHE_EXPIRE_SECONDS:
+            return results
+
+    entry = _read_search_cache(_search_cache_path(search_keywords, target_url))
+    if entry is None:
+        return None
+    stored_at, results = entry
+    # Keep the file's own timestamp, so the entry expires when the file does
+    _remember_search_results(key, results, stored_at)
+    return results
+
+
+def _store_search_results(search_keywords: str, target_url: str, results: tuple[StampResult, ...]):
+    """
+    Saves freshly fetched results in both cache tiers. Empty results are not
+    cached at all, so a captcha or error page never hides a later real page.
+    """
+    if not results:
+        return
+    _remember_search_results((search_keywords, target_url), results)
+    _write_search_cache(_search_cache_path(search_keywords, target_url), results)
+
+
+def _remember_search_results(key: tuple[str, str], results: tuple[StampResult, ...], stored_at: float | None = None):
+    """
+    Puts results in the in-memory cache, dropping the oldest entry when full.
+    stored_at is when the results were fetched (defaults to now).
+    """
+    if stored_at is None:
+        stored_at = time.time()
+    with _search_memory_cache_lock:
+        _search_memory_cache.pop(key, None) # Re-insert so the entry counts as newest
+        if len(_search_memory_cache) >= SEARCH_MEMORY_CACHE_SIZE:
+            del _search_memory_cache[next(iter(_search_memory_cache))]
+        _search_memory_cache[key] = (stored_at, results)
+
+
+def _search_cache_path(search_keywords: str, target_url: str) -> Path:
+    """
+    Returns the on-disk cache file for a search, named by a BLAKE2b hash of
+    the target URL and keywords.
+    """
+    key = hashlib.blake2b(f"{target_url}|{search_keywords}".encode("utf-8"), digest_size=16).hexdigest()
+    return SEARCH_CACHE_DIR / f"{key}.json"
+
 
+def _read_search_cache(cache_path: Path) -> tuple[float, tuple[StampResult, ...]] | None:
+    """
+    Returns (time stored, results) for the entry saved in cache_path, or None
+    if there is no usable entry (missing, older than
+    SEARCH_CACHE_EXPIRE_SECONDS, or unreadable). The time stored is the file's
+    modification time.
+    """
     try:
-        soup = BeautifulSoup(response.content, "html.parser")
+        stored_at = cache_path.stat().st_mtime
+        if time.time() - stored_at > SEARCH_CACHE_EXPIRE_SECONDS:
+            return None
+        return stored_at, tuple(StampResult(**fields) for fields in _json_loads(cache_path.read_bytes()))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError) as e: # JSONDecodeError is a ValueError
+        logger.warning("Ignoring unreadable search cache file %s: %s", cache_path, e)
+        return None
+
+
+def _write_search_cache(cache_path: Path, results: tuple[StampResult, ...]):
+    """
+    Saves results to cache_path. The file is written under a unique
+    temporary name and renamed into place, so readers never see a partial
+    file and concurrent writers of the same key (other threads or processes)
+    never share a temp file. Failures are logged; the search itself has
+    already succeeded.
+    """
+    global _created_search_cache_dir
+    tmp_path = None
+    try:
+        if _created_search_cache_dir != SEARCH_CACHE_DIR:
+            SEARCH_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            _created_search_cache_dir = SEARCH_CACHE_DIR
+        with tempfile.NamedTemporaryFile(
+            dir=SEARCH_CACHE_DIR, prefix=f"{cache_path.stem}.", suffix=".tmp", delete=False
+        ) as tmp_file:
+            tmp_path = Path(tmp_file.name)
+            tmp_file.write(_json_dumps_bytes([asdict(result) for result in results]))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("Could not write search cache file %s: %s", cache_path, e)
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=32)
+def _query_prefix(target_url: str) -> str:
+    """
+    Returns target_url followed by the separator and name of the 'q' query
+    parameter. Computed once per target, since searches rarely switch sites.
+    """
+    # Basic check to see if target_url already contains query params
+    return target_url + ("&q=" if "?" in target_url else "?q=")
+
+
+def _build_search_url(search_keywords: str, target_url: str) -> str:
+    """
+    Appends the URL-encoded search keywords to target_url as the 'q' query
+    parameter. This is a common pattern for many search engines.
+    """
+    return _query_prefix(target_url) + quote_plus(search_keywords)
+
+
+def _parse_html_chunks(chunks, declared_encoding: str | None):
+    """
+    Incrementally parses HTML into an lxml tree, one chunk at a time.
+
+    Args:
+        chunks: An iterable of raw HTML byte strings, e.g. response.iter_content().
+        declared_encoding: The charset declared by the server, or None to let
+                           lxml detect it.
+
+    Returns:
+        The root element of the parsed document.
+    Raises:
+        lxml.etree.XMLSyntaxError: If the document is empty.
+    """
+    parser = lxml.html.HTMLParser(encoding=declared_encoding)
+    for chunk in chunks:
+        if chunk:
+            parser.feed(chunk)
+    return parser.close()
+
+
+def _parse_search_results(doc, target_url: str) -> list[StampResult]:
+    """
+    Extracts up to 5 search results from a parsed search results page.
+
+    Args:
+        doc: The root element of the page, as returned by _parse_html_chunks().
+        target_url: The URL that was searched, used to resolve relative links.
+
+    Returns:
+        Up to 5 StampResult records.
+        Parsing errors are logged and whatever was parsed so far is returned.
+    """
+    results = []
+    try:
+        # All element lookups below are precompiled XPath expressions or a
+        # plain tree walk evaluated in C, so no Python-level soup objects
+        # are created.
+
+        # Links are relative to the page's <base href>, if it declares one
+        base_hrefs = _BASE_HREF_XPATH(doc)
+        base_url = urljoin(target_url, base_hrefs[0]) if base_hrefs else target_url
 
         # --- Generic Google Search Result Parsing Logic ---
         # This logic is highly specific to Google's current HTML structure
@@ -81,65 +438,180 @@ def fetch_stamp_information(
         # A div that contains an <a> tag, and within that <a> tag is an <h3> for the title.
         # The snippet is often in a sibling or nearby div.
 
-        for item in soup.find_all("div", class_=["g", "Gx5Zad", "hlcw0c", "tF2Cxc"]): # Common Google result containers
-            title_element = item.find("h3")
-            link_element = item.find("a")
-            
-            title = title_element.get_text() if title_element else "No title found"
-            url = link_element["href"] if link_element and link_element.has_attr("href") else "No URL found"
-
-            # Make URL absolute if it's relative
-            if url.startswith("/"):
-                url = urljoin(target_url, url)
-            
+        for item in _iter_result_containers(doc): # Common Google result containers
+            title = "No title found"
+            url = "No URL found"
             # Snippet extraction is tricky. Google uses different structures.
             # Trying a few common patterns for snippets.
-            snippet_element = item.find("div", class_=["VwiC3b", "s3v9rd", "BNeawe", "UPmit AP7Wnd"])
-            snippet = snippet_element.get_text(separator=" ", strip=True) if snippet_element else "No snippet found."
+            snippet = "No snippet found."
+            for part in _RESULT_PARTS_XPATH(item):
+                if isinstance(part, str): # The link's href attribute
+                    # Resolve the link against the page's base URL. urljoin handles
+                    # root-relative, path-relative and protocol-relative ("//host")
+                    # links alike, and leaves absolute ones untouched.
+                    url = urljoin(base_url, part)
+                elif part.tag == "h3":
+                    title = part.text_content()
+                else: # The snippet <div>
+                    snippet = _joined_text(part)
             
             # Fallback if specific snippet classes are not found
             if snippet == "No snippet found.":
                 # Look for a div that might contain the snippet text directly within the item
                 # This is very generic.
-                text_blocks = item.find_all(string=True, recursive=True)
-                full_text = ' '.join(filter(None, [t.strip() for t in text_blocks]))
+                full_text = _joined_text(item)
                 # Try to get a reasonable length snippet, avoiding menu items etc.
-                # This is a heuristic.
-                if title in full_text and len(full_text) > len(title):
-                     potential_snippet = full_text[full_text.find(title):].split("\n")[0]
+                # This is a heuristic. The title is searched for once, and only
+                # the 151 characters after it are looked at for a line break,
+                # instead of splitting the whole remaining text.
+                title_pos = full_text.find(title)
+                if title_pos != -1 and len(full_text) > len(title):
+                     potential_snippet = full_text[title_pos:title_pos + 151].partition("\n")[0]
                      if len(potential_snippet) > 150: # Limit snippet length
                          potential_snippet = potential_snippet[:150] + "..."
                      if len(potential_snippet) > 20 and not potential_snippet.startswith("http"): # Basic filter
                         snippet = potential_snippet
 
             if title != "No title found" and url != "No URL found":
-                results.append({
-                    "title": title,
-                    "url": url,
-                    "snippet": snippet,
-                    "estimated_price_range": "Not found", # Placeholder
-                    "country": "Not found",               # Placeholder
-                    "history_notes": "Not found",         # Placeholder
-                })
+                # Price range, country and history keep their "Not found" placeholders
+                results.append(StampResult(title, url, snippet))
             
-            if len(results) >= 5: # Limit to first 5 relevant results
+            if len(results) >= 5: # Limit to first 5 relevant results; the rest of the page is never walked
                 break
         
-        if not results and soup.title: # If no specific results, maybe provide page title
-            print(f"Could not parse specific search results, page title: {soup.title.string}")
+        page_title = doc.find(".//title")
+        if not results and page_title is not None: # If no specific results, maybe provide page title
+            logger.info("Could not parse specific search results, page title: %s", page_title.text_content())
 
 
     except Exception as e:
-        print(f"Error parsing HTML content: {e}")
+        logger.error("Error parsing HTML content: %s", e)
         # results list will remain empty or partially filled
 
     return results
 
 
+async def fetch_stamp_information_many(
+    queries: list[tuple[str, str]], concurrency: int = 16
+) -> list[list[StampResult]]:
+    """
+    Runs several searches concurrently instead of one network round-trip
+    after another.
+
+    With aiohttp installed, all requests share one ClientSession on the event
+    loop (at most 8 connections per host). Otherwise each search runs
+    fetch_stamp_information() on a worker thread. Either way, searches use
+    the same memory and disk result caches and the same retry policy as
+    fetch_stamp_information().
+
+    Args:
+        queries: (search_keywords, target_url) pairs, one per search.
+        concurrency: Maximum number of searches in flight at once.
+
+    Returns:
+        One result list per query, in the same order as queries. A search
+        that fails yields an empty list, as in fetch_stamp_information().
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    if aiohttp is None:
+        async def run_one_in_thread(search_keywords, target_url):
+            async with semaphore:
+                return await asyncio.to_thread(fetch_stamp_information, None, search_keywords, target_url)
+
+        return list(await asyncio.gather(*(run_one_in_thread(kw, url) for kw, url in queries)))
+
+    async def run_one(session, search_keywords, target_url):
+        search_keywords = _clean_search_keywords(search_keywords, target_url)
+        if not search_keywords:
+            return []
+        cached_results = _get_cached_search_results(search_keywords, target_url)
+        if cached_results is not None:
+            return list(cached_results)
+
+        search_url = _build_search_url(search_keywords, target_url)
+        async with semaphore:
+            logger.debug("Fetching information from: %s", search_url)
+            parser = await _fetch_and_feed_with_retries(session, search_url)
+        if parser is None:
+            return [] # Already logged
+        try:
+            doc = parser.close()
+        except lxml.etree.XMLSyntaxError as e:
+            logger.error("Error parsing HTML content: %s", e)
+            return []
+        # Extraction is synchronous and fast, so it runs right on the event loop
+        results = tuple(_parse_search_results(doc, target_url))
+        _store_search_results(search_keywords, target_url, results)
+        return list(results)
+
+    async with aiohttp.ClientSession(
+        headers=_DEFAULT_HEADERS,
+        timeout=aiohttp.ClientTimeout(total=10),
+        connector=aiohttp.TCPConnector(limit_per_host=8),
+    ) as session:
+        return list(await asyncio.gather(*(run_one(session, kw, url) for kw, url in queries)))
+
+
+async def _fetch_and_feed_with_retries(session, search_url: str):
+    """
+    GETs search_url with aiohttp and feeds the body to an lxml HTMLParser as
+    chunks arrive, retrying like the requests session's Retry: up to
+    RETRY_TOTAL times on connection errors, timeouts and
+    RETRY_STATUS_FORCELIST statuses, with exponential backoff or the
+    server's Retry-After (capped at RETRY_AFTER_MAX_SECONDS).
+
+    Returns:
+        The fed (not yet closed) parser, or None if the request failed; the
+        error has been logged.
+    """
+    for attempt in range(RETRY_TOTAL + 1):
+        retry_after = None
+        try:
+            async with session.get(search_url) as response:
+                if response.status in RETRY_STATUS_FORCELIST and attempt < RETRY_TOTAL:
+                    retry_after = response.headers.get("Retry-After")
+                else:
+                    response.raise_for_status()
+                    # Feed the parser as chunks arrive, like the synchronous path
+                    parser = lxml.html.HTMLParser(encoding=response.charset)
+                    async for chunk in response.content.iter_chunked(HTML_CHUNK_SIZE):
+                        parser.feed(chunk)
+                    return parser
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if attempt == RETRY_TOTAL:
+                logger.error("Error fetching URL %s: %s", search_url, e)
+                return None
+        except aiohttp.ClientError as e:
+            logger.error("Error fetching URL %s: %s", search_url, e)
+            return None
+        except Exception as e:
+            logger.error("An unexpected error occurred during request: %s", e)
+            return None
+
+        if retry_after is not None and retry_after.strip().isdigit():
+            delay = min(int(retry_after), RETRY_AFTER_MAX_SECONDS)
+        else:
+            delay = RETRY_BACKOFF_FACTOR * (2 ** attempt)
+        await asyncio.sleep(delay)
+    return None # Not reached: the last attempt always returns above
+
+
+def fetch_stamp_information_many_sync(
+    queries: list[tuple[str, str]], concurrency: int = 16
+) -> list[list[StampResult]]:
+    """
+    Blocking wrapper around fetch_stamp_information_many() for callers that
+    don't run an event loop. Must not be called from inside a running loop.
+    """
+    return asyncio.run(fetch_stamp_information_many(queries, concurrency))
+
+
 def main_test():
     """
     Tests the fetch_stamp_information function with sample data.
     """
+    logging.basicConfig(level=logging.INFO)
     print("Testing fetch_stamp_information...")
 
     # Dummy path, not used by the current version of the function for analysis
@@ -157,34 +629,40 @@ def main_test():
     # Alternative for testing: a site that might be friendlier to scraping, if available
     # target_url = "https://www.example.com/search" # Replace with a real, scrapable site if possible
 
-    print(f"\nSearching for: '{search_keywords}' on {target_url}")
-    fetched_info = fetch_stamp_information(dummy_image_path, search_keywords, target_url)
+    # Example with a more specific (but still hypothetical) query
+    search_keywords_specific = "Penny Black value"
+
+    # The two searches are independent, so run them at the same time;
+    # requests releases the GIL while waiting on the network.
+    print(f"\nSearching for: '{search_keywords}' and '{search_keywords_specific}' on {target_url}")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        fetched_info, fetched_info_specific = executor.map(
+            lambda keywords: fetch_stamp_information(dummy_image_path, keywords, target_url),
+            [search_keywords, search_keywords_specific]
+        )
 
+    print(f"\nResults for: '{search_keywords}'")
     if fetched_info:
         print("\n--- Fetched Information ---")
         for i, info in enumerate(fetched_info):
             print(f"\nResult {i+1}:")
-            print(f"  Title: {info['title']}")
-            print(f"  URL: {info['url']}")
-            print(f"  Snippet: {info['snippet']}")
-            print(f"  Price Range: {info['estimated_price_range']}")
-            print(f"  Country: {info['country']}")
-            print(f"  History: {info['history_notes']}")
+            print(f"  Title: {info.title}")
+            print(f"  URL: {info.url}")
+            print(f"  Snippet: {info.snippet}")
+            print(f"  Price Range: {info.estimated_price_range}")
+            print(f"  Country: {info.country}")
+            print(f"  History: {info.history_notes}")
     else:
         print("\nNo information fetched or an error occurred.")
 
-    # Example with a more specific (but still hypothetical) query
-    search_keywords_specific = "Penny Black value"
-    print(f"\nSearching for: '{search_keywords_specific}' on {target_url}")
-    fetched_info_specific = fetch_stamp_information(dummy_image_path, search_keywords_specific, target_url)
-
+    print(f"\nResults for: '{search_keywords_specific}'")
     if fetched_info_specific:
         print("\n--- Fetched Information (Specific) ---")
         for i, info in enumerate(fetched_info_specific):
             print(f"\nResult {i+1}:")
-            print(f"  Title: {info['title']}")
-            print(f"  URL: {info['url']}")
-            print(f"  Snippet: {info['snippet']}")
+            print(f"  Title: {info.title}")
+            print(f"  URL: {info.url}")
+            print(f"  Snippet: {info.snippet}")
     else:
         print("\nNo information fetched for the specific query or an error occurred.")
 